@@ -1,6 +1,10 @@
 # server.py
 from mcp.server.fastmcp import FastMCP
-import requests, random, time
+import random, time, atexit, threading, os, pickle, functools, asyncio, sys
+import httpx
+import orjson
+from collections import OrderedDict
+from enum import IntEnum
 from typing import Dict, Optional
 
 mcp = FastMCP(name="Pokémon MCP Server")
@@ -8,60 +12,273 @@ mcp = FastMCP(name="Pokémon MCP Server")
 # -------------------------------
 # Utilities / Caching
 # -------------------------------
-MOVE_CACHE: Dict[str, Dict] = {}
-POKEMON_CACHE: Dict[str, Dict] = {}
+CACHE_MAXSIZE = 4096
+
+class LRUCache(OrderedDict):
+    """Thread-safe, size-bounded dict that evicts the least recently used entry.
+    on_evict(key) is called for each evicted key, so side tables can drop their entry too.
+    """
+
+    def __init__(self, maxsize: int = CACHE_MAXSIZE, on_evict=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self:
+                self.move_to_end(key)
+                self.hits += 1
+                return super().__getitem__(key)
+            self.misses += 1
+            return default
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.maxsize:
+                evicted, _ = self.popitem(last=False)
+                if self.on_evict is not None:
+                    self.on_evict(evicted)
+
+    def setdefault(self, key, default=None):
+        """Insert default unless another thread got there first; return the stored value."""
+        with self._lock:
+            if key in self:
+                return super().__getitem__(key)
+            self[key] = default
+            return default
+
+    def snapshot(self) -> Dict:
+        """Plain-dict copy in LRU order (oldest first), safe to pickle."""
+        with self._lock:
+            return dict(self)
+
+    def cache_info(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "maxsize": self.maxsize, "currsize": len(self)}
+
+# request path -> (ETag, time validated); entries without a validator are never revalidated.
+# Pruned together with the cache entry when the LRU evicts it.
+ETAGS: Dict[str, tuple] = {}
+
+MOVE_CACHE = LRUCache(on_evict=lambda key: ETAGS.pop(f"/move/{key}", None))
+POKEMON_CACHE = LRUCache(on_evict=lambda key: ETAGS.pop(f"/pokemon/{key}", None))
 ALL_POKEMON_CACHE: Optional[list] = None
 POKEAPI_BASE = "https://pokeapi.co/api/v2"
+POKEAPI_GRAPHQL = "https://beta.pokeapi.co/graphql/v1beta"
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+HTTP_HEADERS = {"User-Agent": "pokemon-mcp"}
+
+# Async client for tool handlers: HTTP/2 multiplexing + keep-alive, so gathered lookups share connections.
+# The transport only retries failed connections; status retries are done by conditional_get.
+ASYNC = httpx.AsyncClient(
+    base_url=POKEAPI_BASE,
+    headers=HTTP_HEADERS,
+    timeout=HTTP_TIMEOUT,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    ),
+)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.2  # seconds, doubled after each retry
+# At most this many REST GETs in flight, so a cold learnset scan doesn't trip PokéAPI's rate limit
+_REST_SLOTS = asyncio.Semaphore(8)
 
+# -------------------------------
+# Persistent cache (survives server restarts)
+# -------------------------------
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pokecache.pkl")
+CACHE_SCHEMA = 9  # bump whenever the shape of cached entries changes
+CACHE_TTL = 24 * 3600  # seconds before a cached REST entry is revalidated with If-None-Match
+
+def load_caches() -> None:
+    """Load MOVE_CACHE/POKEMON_CACHE/ALL_POKEMON_CACHE from disk if a compatible file exists."""
+    global ALL_POKEMON_CACHE
+    try:
+        with open(CACHE_FILE, "rb") as f:
+            schema, moves, pokemon, all_pokemon, etags = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+        return
+    if schema != CACHE_SCHEMA:
+        return
+    # validators first, so anything the LRUs evict while loading drops its ETag too
+    ETAGS.update(etags)
+    MOVE_CACHE.update(moves)
+    POKEMON_CACHE.update(pokemon)
+    ALL_POKEMON_CACHE = all_pokemon
+
+def save_caches() -> None:
+    """Write the caches to disk atomically (temp file + rename)."""
+    tmp = CACHE_FILE + ".tmp"
+    try:
+        payload = (CACHE_SCHEMA, MOVE_CACHE.snapshot(), POKEMON_CACHE.snapshot(), ALL_POKEMON_CACHE, dict(ETAGS))
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        pass
+
+def is_stale(path: str) -> bool:
+    """True if the cached response for path carries an ETag older than CACHE_TTL."""
+    validator = ETAGS.get(path)
+    return validator is not None and time.time() - validator[1] > CACHE_TTL
+
+async def conditional_get(path: str, cached: Optional[Dict]):
+    """GET path, sending If-None-Match when a cached copy with a known ETag exists.
+    429/5xx answers are retried with exponential backoff; the last response is returned either way.
+    """
+    validator = ETAGS.get(path)
+    headers = {"If-None-Match": validator[0]} if cached is not None and validator else {}
+    async with _REST_SLOTS:
+        res = await ASYNC.get(path, headers=headers)
+        for attempt in range(RETRY_TOTAL):
+            if res.status_code not in RETRY_STATUSES:
+                break
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+            res = await ASYNC.get(path, headers=headers)
+    return res
+
+def remember_validator(path: str, res) -> None:
+    """Record the response's ETag (or refresh its timestamp after a 304)."""
+    etag = res.headers.get("ETag") or (ETAGS.get(path) or (None,))[0]
+    if etag:
+        ETAGS[path] = (etag, time.time())
+
+load_caches()
+atexit.register(save_caches)
+
+# -------------------------------
+# Background Pokédex preload (opponent pool for start_battle)
+# -------------------------------
+FALLBACK_POKEMON = ["charmander", "squirtle", "bulbasaur", "pidgey", "geodude"]
+_ALL_READY = threading.Event()
+
+def _preload_all_pokemon() -> None:
+    """Fetch the full Pokémon name list once, off the request path."""
+    global ALL_POKEMON_CACHE
+    try:
+        # one GET from a plain thread (no event loop), so a short-lived sync client is enough
+        with httpx.Client(headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, transport=httpx.HTTPTransport(retries=3)) as client:
+            res = client.get(f"{POKEAPI_BASE}/pokemon?limit=10000")
+        if res.status_code == 200:
+            ALL_POKEMON_CACHE = [entry["name"] for entry in orjson.loads(res.content).get("results", [])]
+    except httpx.HTTPError:
+        pass
+    finally:
+        _ALL_READY.set()
+
+if ALL_POKEMON_CACHE is None:
+    threading.Thread(target=_preload_all_pokemon, name="pokedex-preload", daemon=True).start()
+else:
+    _ALL_READY.set()
+
+_RNG = threading.local()
+
+def rng() -> random.Random:
+    """Per-thread Random instance, so hot paths don't share the module-level generator."""
+    r = getattr(_RNG, "r", None)
+    if r is None:
+        r = _RNG.r = random.Random()
+    return r
+
+_STRIP_PUNCT = str.maketrans("", "", "'.:")
+
+@functools.lru_cache(maxsize=8192)
 def normalize_name(name: str) -> str:
     """Normalize names for PokeAPI (lowercase, spaces -> hyphens, strip punctuation)."""
-    return name.strip().lower().replace(" ", "-").replace("'", "").replace(".", "").replace(":", "")
+    return name.strip().lower().replace(" ", "-").translate(_STRIP_PUNCT)
 
 # -------------------------------
 # Pokémon fetching with caching
 # -------------------------------
-def fetch_pokemon(name: str) -> Dict:
+async def fetch_pokemon(name: str) -> Dict:
     """Fetch Pokémon data from PokéAPI with caching."""
     key = normalize_name(name)
-    if key in POKEMON_CACHE:
-        return POKEMON_CACHE[key]
-
-    url = f"{POKEAPI_BASE}/pokemon/{key}"
-    res = requests.get(url)
+    path = f"/pokemon/{key}"
+    cached = POKEMON_CACHE.get(key)
+    if cached is not None and not is_stale(path):
+        return cached
+
+    try:
+        res = await conditional_get(path, cached)
+    except httpx.HTTPError:
+        # offline/timeout while revalidating: the stale copy beats failing; cold misses still raise
+        if cached is not None:
+            return cached
+        raise
+    if cached is not None and res.status_code != 200:
+        # 304 Not Modified (or a transient error): keep serving the cached copy
+        if res.status_code == 304:
+            remember_validator(path, res)
+        return cached
     if res.status_code != 200:
         raise ValueError(f"Pokémon '{name}' not found (status {res.status_code}).")
-    data = res.json()
-    stats = {s["stat"]["name"]: s["base_stat"] for s in data["stats"]}
-    moves = [m["move"]["name"] for m in data["moves"]]  # full move list
+    # orjson decodes the ~40 KB payload faster than stdlib json; only the fields below are kept
+    data = orjson.loads(res.content)
+    # names come from small fixed vocabularies shared across species; intern them so
+    # every cached Pokémon points at the same string objects
+    stats = {sys.intern(s["stat"]["name"]): s["base_stat"] for s in data["stats"]}
+    types = [sys.intern(t["type"]["name"]) for t in data["types"]]
+    moves = tuple(sys.intern(normalize_name(m["move"]["name"])) for m in data["moves"])  # full move list, pre-normalized
 
     pokemon_obj = {
         "name": data["name"],
         "stats": stats,
         "max_hp": stats["hp"],
-        "types": [t["type"]["name"] for t in data["types"]],
+        "types": types,
+        # flattened combat stats so calculate_damage/play_turn skip the nested lookups
+        # (both fall back to stats when a client-supplied state lacks them)
+        "atk": stats.get("attack", 1),
+        "spa": stats.get("special-attack", stats.get("attack", 1)),
+        "def_": stats.get("defense", 1),
+        "spd_": stats.get("special-defense", stats.get("defense", 1)),
+        "speed": stats.get("speed", 1),
         "moves": moves,
-        # status stored as dict {"name":..., "duration": int|None} or None
+        # filled lazily on first use by play_turn (names of moves that deal damage)
+        "damaging_moves": None,
+        # move meta the opponent AI settles on once damaging_moves is known
+        "best_move_meta": None,
+        # status stored as dict {"name": "burn"|"sleep"|..., "duration": int|None} or None
         "status": None,
         "status_counter": 0,
     }
 
+    remember_validator(path, res)
     POKEMON_CACHE[key] = pokemon_obj
     return pokemon_obj
 
 # -------------------------------
 # Move fetching with caching (and caching failures)
 # -------------------------------
-def fetch_move(move_name: str) -> Dict:
+async def fetch_move(move_name: str) -> Dict:
     """Fetch move meta from PokeAPI with simple caching; returns normalized fields."""
     key = normalize_name(move_name)
-    if key in MOVE_CACHE:
-        # return {"key":"from cache"}
-        return MOVE_CACHE[key]
-
-    url = f"{POKEAPI_BASE}/move/{key}"
-    res = requests.get(url)
+    path = f"/move/{key}"
+    cached = MOVE_CACHE.get(key)
+    if cached is not None and not is_stale(path):
+        return cached
+
+    try:
+        res = await conditional_get(path, cached)
+    except httpx.HTTPError:
+        # offline/timeout while revalidating: the stale copy beats failing; cold misses still raise
+        if cached is not None:
+            return cached
+        raise
+    if cached is not None and res.status_code != 200:
+        # 304 Not Modified (or a transient error): keep serving the cached copy
+        if res.status_code == 304:
+            remember_validator(path, res)
+        return cached
     if res.status_code != 200:
-        # Cache the failure result so we don't repeatedly hit the same bad move
         placeholder = {
             "name": move_name,
             "power": None,
@@ -71,10 +288,13 @@ def fetch_move(move_name: str) -> Dict:
             "ailment": None,
             "ailment_chance": 0
         }
-        MOVE_CACHE[key] = placeholder
-        return placeholder
+        if res.status_code != 404:
+            # 429/5xx are transient: answer with the placeholder but don't remember it
+            return placeholder
+        # Cache the 404 so we don't repeatedly hit the same bad move
+        return MOVE_CACHE.setdefault(key, placeholder)
 
-    m = res.json()
+    m = orjson.loads(res.content)
     meta = m.get("meta", {}) or {}
     info = {
         "name": m["name"],
@@ -85,86 +305,237 @@ def fetch_move(move_name: str) -> Dict:
         "ailment": meta.get("ailment", {}).get("name", None),
         "ailment_chance": meta.get("ailment_chance", 0) or 0,
     }
+    remember_validator(path, res)
     MOVE_CACHE[key] = info
     return info
 
+MOVE_BATCH_QUERY = """
+query($names: [String!]) {
+  pokemon_v2_move(where: {name: {_in: $names}}) {
+    name
+    power
+    accuracy
+    pokemon_v2_type { name }
+    pokemon_v2_movedamageclass { name }
+    pokemon_v2_movemeta { ailment_chance pokemon_v2_movemetaailment { name } }
+  }
+}
+"""
+
+async def graphql_move_batch(names: list) -> Dict[str, Dict]:
+    """Fetch metadata for many moves with a single PokéAPI GraphQL query and store it in MOVE_CACHE.
+    Returns the newly cached entries; on any failure returns {} and fetch_move falls back to REST.
+    """
+    missing = [n for n in dict.fromkeys(names) if n not in MOVE_CACHE]
+    if not missing:
+        return {}
+    try:
+        res = await ASYNC.post(POKEAPI_GRAPHQL, json={"query": MOVE_BATCH_QUERY, "variables": {"names": missing}})
+    except httpx.HTTPError:
+        return {}
+    if res.status_code != 200:
+        return {}
+    try:
+        payload = orjson.loads(res.content)
+    except orjson.JSONDecodeError:
+        return {}
+    if payload.get("errors"):
+        return {}
+
+    fetched = {}
+    for m in (payload.get("data") or {}).get("pokemon_v2_move", []):
+        meta = (m.get("pokemon_v2_movemeta") or [{}])[0]
+        info = {
+            "name": m["name"],
+            "power": m["power"],
+            "accuracy": m["accuracy"],
+            "type": (m.get("pokemon_v2_type") or {}).get("name"),
+            "damage_class": (m.get("pokemon_v2_movedamageclass") or {}).get("name", "status"),
+            "ailment": (meta.get("pokemon_v2_movemetaailment") or {}).get("name"),
+            "ailment_chance": meta.get("ailment_chance", 0) or 0,
+        }
+        fetched[m["name"]] = MOVE_CACHE.setdefault(m["name"], info)
+    return fetched
+
+# Moves whose drawback the engine doesn't model (self-KO, recharge turn, charge turn). Ranked purely on
+# power x accuracy they would win every time at no cost, so the opponent AI only falls back to them.
+DRAWBACK_MOVES = frozenset({
+    "explosion", "self-destruct", "misty-explosion",
+    "hyper-beam", "giga-impact", "blast-burn", "frenzy-plant", "hydro-cannon", "rock-wrecker",
+    "roar-of-time", "prismatic-laser", "eternabeam", "meteor-assault",
+    "solar-beam", "solar-blade", "sky-attack", "skull-bash", "razor-wind", "meteor-beam",
+    "freeze-shock", "ice-burn", "fly", "dig", "dive", "bounce", "phantom-force", "shadow-force", "sky-drop",
+})
+
+def expected_power(move_meta: Dict) -> float:
+    """Power weighted by accuracy (moves that never miss count as 100%)."""
+    return (move_meta["power"] or 0) * (move_meta.get("accuracy") or 100)
+
+# species whose learnset has already gone through the GraphQL batch (tried once per process;
+# whatever it missed is left to fetch_move's REST fallback)
+_LEARNSET_TRIED: set = set()
+# species name -> learnset prefetch still in flight
+_LEARNSET_PREFETCH: Dict[str, asyncio.Task] = {}
+
+def _prefetch_done(name: str, task: asyncio.Task) -> None:
+    _LEARNSET_PREFETCH.pop(name, None)
+    if not task.cancelled():
+        task.exception()  # retrieve it, so a failed batch isn't logged as "never retrieved"
+
+def prefetch_learnset(pokemon: Dict) -> None:
+    """Warm MOVE_CACHE for pokemon's moves with one GraphQL query, in the background."""
+    name = pokemon["name"]
+    if name in _LEARNSET_TRIED:
+        return
+    _LEARNSET_TRIED.add(name)
+    task = asyncio.create_task(graphql_move_batch(list(pokemon["moves"])))
+    _LEARNSET_PREFETCH[name] = task
+    task.add_done_callback(functools.partial(_prefetch_done, name))
+
+async def await_learnset(pokemon: Dict) -> None:
+    """Wait for the prefetch of pokemon's moves, starting it first if this species was never tried."""
+    prefetch_learnset(pokemon)
+    task = _LEARNSET_PREFETCH.get(pokemon["name"])
+    if task is None:
+        return
+    try:
+        await task
+    except Exception:
+        pass  # a failed batch only means the REST fallback does the work
+
+async def find_damaging_moves(move_names: list) -> list:
+    """Return (name, meta) pairs for the moves in move_names that deal damage, fetched concurrently.
+    Moves whose lookup failed count as non-damaging (fetch_move didn't cache them, so a later scan retries).
+    """
+    metas = await asyncio.gather(*(fetch_move(m) for m in move_names), return_exceptions=True)
+    return [
+        (name, mm) for name, mm in zip(move_names, metas)
+        if not isinstance(mm, BaseException) and mm["damage_class"] in ("physical", "special") and mm.get("power")
+    ]
+
 # -------------------------------
-# Type effectiveness (partial, add more if you want)
+# Type effectiveness (full Gen 6+ chart; only non-neutral pairs listed)
 # -------------------------------
+CANONICAL_TYPES = (
+    "normal", "fire", "water", "electric", "grass", "ice", "fighting", "poison", "ground",
+    "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy",
+)
 TYPE_EFFECTIVENESS = {
-    "normal": {},
-    "fire":     {"grass": 2.0, "water": 0.5, "fire": 0.5, "rock": 0.5, "ice": 2.0, "bug": 2.0, "steel": 2.0},
-    "water":    {"fire": 2.0, "water": 0.5, "grass": 0.5, "ground": 2.0, "rock": 2.0},
-    "grass":    {"water": 2.0, "fire": 0.5, "grass": 0.5, "ground": 2.0, "rock": 2.0, "flying": 0.5},
-    "electric": {"water": 2.0, "electric": 0.5, "ground": 0.0, "flying": 2.0},
-    "ground":   {"fire": 2.0, "electric": 2.0, "grass": 0.5, "flying": 0.0},
-    "ice":      {"grass": 2.0, "ground": 2.0, "flying": 2.0, "dragon": 2.0, "fire": 0.5, "water": 0.5},
-    # extend as required...
+    "normal":   {"rock": 0.5, "ghost": 0.0, "steel": 0.5},
+    "fire":     {"grass": 2.0, "water": 0.5, "fire": 0.5, "rock": 0.5, "ice": 2.0, "bug": 2.0, "steel": 2.0, "dragon": 0.5},
+    "water":    {"fire": 2.0, "water": 0.5, "grass": 0.5, "ground": 2.0, "rock": 2.0, "dragon": 0.5},
+    "electric": {"water": 2.0, "electric": 0.5, "grass": 0.5, "ground": 0.0, "flying": 2.0, "dragon": 0.5},
+    "grass":    {"water": 2.0, "fire": 0.5, "grass": 0.5, "poison": 0.5, "ground": 2.0, "flying": 0.5,
+                 "bug": 0.5, "rock": 2.0, "dragon": 0.5, "steel": 0.5},
+    "ice":      {"grass": 2.0, "ground": 2.0, "flying": 2.0, "dragon": 2.0, "fire": 0.5, "water": 0.5,
+                 "ice": 0.5, "steel": 0.5},
+    "fighting": {"normal": 2.0, "ice": 2.0, "poison": 0.5, "flying": 0.5, "psychic": 0.5, "bug": 0.5,
+                 "rock": 2.0, "ghost": 0.0, "dark": 2.0, "steel": 2.0, "fairy": 0.5},
+    "poison":   {"grass": 2.0, "poison": 0.5, "ground": 0.5, "rock": 0.5, "ghost": 0.5, "steel": 0.0, "fairy": 2.0},
+    "ground":   {"fire": 2.0, "electric": 2.0, "grass": 0.5, "poison": 2.0, "flying": 0.0, "bug": 0.5,
+                 "rock": 2.0, "steel": 2.0},
+    "flying":   {"electric": 0.5, "grass": 2.0, "fighting": 2.0, "bug": 2.0, "rock": 0.5, "steel": 0.5},
+    "psychic":  {"fighting": 2.0, "poison": 2.0, "psychic": 0.5, "dark": 0.0, "steel": 0.5},
+    "bug":      {"fire": 0.5, "grass": 2.0, "fighting": 0.5, "poison": 0.5, "flying": 0.5, "psychic": 2.0,
+                 "ghost": 0.5, "dark": 2.0, "steel": 0.5, "fairy": 0.5},
+    "rock":     {"fire": 2.0, "ice": 2.0, "fighting": 0.5, "ground": 0.5, "flying": 2.0, "bug": 2.0, "steel": 0.5},
+    "ghost":    {"normal": 0.0, "psychic": 2.0, "ghost": 2.0, "dark": 0.5},
+    "dragon":   {"dragon": 2.0, "steel": 0.5, "fairy": 0.0},
+    "dark":     {"fighting": 0.5, "psychic": 2.0, "ghost": 2.0, "dark": 0.5, "fairy": 0.5},
+    "steel":    {"fire": 0.5, "water": 0.5, "electric": 0.5, "ice": 2.0, "rock": 2.0, "steel": 0.5, "fairy": 2.0},
+    "fairy":    {"fire": 0.5, "fighting": 2.0, "poison": 0.5, "dragon": 2.0, "dark": 2.0, "steel": 0.5},
 }
+# Densify at import so every canonical pair is present and lookups never need a default
+for _atk in CANONICAL_TYPES:
+    _row = TYPE_EFFECTIVENESS.setdefault(_atk, {})
+    for _def in CANONICAL_TYPES:
+        _row.setdefault(_def, 1.0)
 
 # -------------------------------
 # Status effect helpers
 # -------------------------------
+class Status(IntEnum):
+    """Major status conditions; the battle state stores their label under "name", as it always has."""
+    BURN = 1
+    POISON = 2
+    PARALYSIS = 3
+    SLEEP = 4
+    FREEZE = 5
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+# PokéAPI ailment name -> Status (other ailments such as confusion are not modelled)
+AILMENT_STATUS = {s.label: s for s in Status}
+# Passive end-of-turn damage as a fraction of max HP (burn: 1/16, poison: 1/8)
+PASSIVE = {Status.BURN: 16, Status.POISON: 8}
+# Module-level aliases for the per-turn identity checks: attribute access on an Enum class
+# costs ~100 ns on CPython 3.10, several times a global lookup. The checks themselves are
+# written inline as AILMENT_STATUS.get(status["name"]) for the same reason (no helper call).
+BURN, PARALYSIS, SLEEP = Status.BURN, Status.PARALYSIS, Status.SLEEP
+
 def apply_status_end_of_turn(pokemon: Dict, current_hp: int) -> (int, list):
     """Apply per-turn passive damage for statuses and decrement durations."""
     logs = []
     status = pokemon.get("status")
-    if not status:
+    kind = AILMENT_STATUS.get(status["name"]) if status else None
+    if kind is None:
         return current_hp, logs
 
-    name = status["name"]
     duration = status.get("duration")  # None means persistent until cured
     max_hp = pokemon.get("max_hp", current_hp)
 
-    # Passive damage per classic mechanics (burn: 1/16, poison: 1/8)
-    if name == "burn":
-        dmg = max(1, max_hp // 16)
-        current_hp -= dmg
-        logs.append(f"{pokemon['name']} is hurt by burn and loses {dmg} HP.")
-    elif name == "poison":
-        dmg = max(1, max_hp // 8)
+    divisor = PASSIVE.get(kind)
+    if divisor:
+        dmg = max(1, max_hp // divisor)
         current_hp -= dmg
-        logs.append(f"{pokemon['name']} is hurt by poison and loses {dmg} HP.")
+        logs.append(f"{pokemon['name']} is hurt by {status['name']} and loses {dmg} HP.")
 
     # decrement duration if present and positive
     if isinstance(duration, int):
         status["duration"] = duration - 1
         if status["duration"] <= 0:
             pokemon["status"] = None
-            logs.append(f"{pokemon['name']} is no longer {name}.")
+            logs.append(f"{pokemon['name']} is no longer {status['name']}.")
 
     return current_hp, logs
 
-def can_act(pokemon: Dict) -> (bool, Optional[str]):
-    """Return (can_act, message). Handles paralysis, sleep, freeze behavior."""
-    status = pokemon.get("status")
-    if not status:
-        return True, None
+def _paralysis_check(pokemon: Dict, status: Dict) -> (bool, Optional[str]):
+    if rng().random() < 0.25:
+        return False, f"{pokemon['name']} is paralyzed! It can't move!"
+    return True, None
 
-    name = status["name"]
+def _sleep_check(pokemon: Dict, status: Dict) -> (bool, Optional[str]):
     duration = status.get("duration")
+    if isinstance(duration, int) and duration > 0:
+        status["duration"] = duration - 1
+        return False, f"{pokemon['name']} is fast asleep..."
+    pokemon["status"] = None
+    return True, None
 
-    if name == "paralysis":
-        if random.random() < 0.25:
-            return False, f"{pokemon['name']} is paralyzed! It can't move!"
+def _freeze_check(pokemon: Dict, status: Dict) -> (bool, Optional[str]):
+    if rng().random() < 0.2:
+        pokemon["status"] = None
         return True, None
+    return False, f"{pokemon['name']} is frozen solid!"
 
-    if name == "sleep":
-        if isinstance(duration, int) and duration > 0:
-            status["duration"] = duration - 1
-            return False, f"{pokemon['name']} is fast asleep..."
-        else:
-            pokemon["status"] = None
-            return True, None
-
-    if name == "freeze":
-        if random.random() < 0.2:
-            pokemon["status"] = None
-            return True, None
-        else:
-            return False, f"{pokemon['name']} is frozen solid!"
+# Statuses that can stop a Pokémon from acting; burn/poison only deal passive damage
+CAN_ACT_HANDLERS = {
+    Status.PARALYSIS: _paralysis_check,
+    Status.SLEEP: _sleep_check,
+    Status.FREEZE: _freeze_check,
+}
 
-    return True, None
+def can_act(pokemon: Dict) -> (bool, Optional[str]):
+    """Return (can_act, message). Handles paralysis, sleep, freeze behavior."""
+    status = pokemon.get("status")
+    if not status:
+        return True, None
+    handler = CAN_ACT_HANDLERS.get(AILMENT_STATUS.get(status["name"]))
+    if handler is None:
+        return True, None
+    return handler(pokemon, status)
 
 # -------------------------------
 # Damage & status application
@@ -175,10 +546,10 @@ def apply_ailment_from_move(move_meta: Dict, target: Dict, by_status_move: bool)
     - If move is a status move (by_status_move==True), we assume deterministic application.
     - If it's a secondary effect from a damaging move, use ailment_chance.
     """
-    ailment = move_meta.get("ailment")
+    kind = AILMENT_STATUS.get(move_meta.get("ailment"))
     chance = move_meta.get("ailment_chance", 0) or 0
 
-    if not ailment:
+    if kind is None:
         return None
 
     # determine whether ailment happens
@@ -186,7 +557,7 @@ def apply_ailment_from_move(move_meta: Dict, target: Dict, by_status_move: bool)
     if by_status_move:
         happens = True
     else:
-        if chance and random.randint(1, 100) <= chance:
+        if chance and rng().randint(1, 100) <= chance:
             happens = True
 
     if not happens:
@@ -196,25 +567,21 @@ def apply_ailment_from_move(move_meta: Dict, target: Dict, by_status_move: bool)
     if target.get("status"):
         return f"{target['name']} is already afflicted and the move had no effect."
 
-    # Set durations by ailment type
-    if ailment == "sleep":
-        dur = random.randint(1, 3)
-    elif ailment == "poison":
-        dur = None  # now classic: persistent until cured
-    elif ailment == "paralysis":
-        dur = None
-    elif ailment == "burn":
-        dur = None
-    elif ailment == "freeze":
-        dur = None
-    else:
-        dur = None
-
-    target["status"] = {"name": ailment, "duration": dur}
-    if ailment == "sleep":
-        target["status"]["duration"] = dur
+    # Sleep lasts 1-3 turns; every other status is classic: persistent until cured
+    if kind is SLEEP:
+        dur = rng().randint(1, 3)
+        target["status"] = {"name": kind.label, "duration": dur}
         return f"{target['name']} fell asleep! ({dur} turn(s))"
-    return f"{target['name']} is afflicted with {ailment}!"
+    target["status"] = {"name": kind.label, "duration": None}
+    return f"{target['name']} is afflicted with {kind.label}!"
+
+# Simplified damage formula at a fixed level 50: ((2*L/5 + 2) * power * A/D) / 50 + 2
+LEVEL_FACTOR = (2 * 50 / 5 + 2) / 50
+
+def _damage(power: int, atk: int, defense: int, stab: float, t_mult: float, crit: int, rand: float) -> int:
+    """Pure arithmetic kernel of calculate_damage (all randomness/lookups resolved by the caller)."""
+    base = LEVEL_FACTOR * power * atk / max(1, defense) + 2
+    return int(base * stab * t_mult * crit * rand)
 
 def calculate_damage(att: Dict, defn: Dict, move_meta: Dict) -> (int, Optional[dict]):
     """
@@ -228,89 +595,90 @@ def calculate_damage(att: Dict, defn: Dict, move_meta: Dict) -> (int, Optional[d
 
     # Damaging move
     power = move_meta["power"] or 0
-    damage_class = move_meta["damage_class"]
-    atk_stat = "attack" if damage_class == "physical" else "special-attack"
-    def_stat = "defense" if damage_class == "physical" else "special-defense"
-
-    atk = att["stats"].get(atk_stat, att["stats"].get("attack", 1))
-    defense = defn["stats"].get(def_stat, defn["stats"].get("defense", 1))
-
-    # Burn penalty
-    if att.get("status") and att["status"]["name"] == "burn" and damage_class == "physical":
-        atk = max(1, atk // 2)
+    if move_meta["damage_class"] == "physical":
+        atk = att.get("atk") or att["stats"].get("attack", 1)
+        defense = defn.get("def_") or defn["stats"].get("defense", 1)
+        # Burn penalty
+        status = att.get("status")
+        if status and AILMENT_STATUS.get(status["name"]) is BURN:
+            atk = max(1, atk // 2)
+    else:
+        atk = att.get("spa") or att["stats"].get("special-attack", att["stats"].get("attack", 1))
+        defense = defn.get("spd_") or defn["stats"].get("special-defense", defn["stats"].get("defense", 1))
 
     # Accuracy
+    r = rng()
     accuracy = move_meta.get("accuracy")
     if accuracy is not None:
-        if random.randint(1, 100) > int(accuracy):
+        if r.randint(1, 100) > int(accuracy):
             return 0, "miss"
 
     # Crit, rand
-    crit = 2 if random.random() < 0.10 else 1
-    rand = random.uniform(0.85, 1.0)
+    crit = 2 if r.random() < 0.10 else 1
+    rand = r.uniform(0.85, 1.0)
 
     # STAB
-    stab = 1.5 if move_meta.get("type") in att.get("types", []) else 1.0
+    mtype = move_meta.get("type")
+    stab = 1.5 if mtype in att.get("types", ()) else 1.0
 
-    # Type effectiveness using local TYPE_EFFECTIVENESS (fast, cached)
+    # Type effectiveness: the chart is dense, so canonical types need no .get defaults;
+    # anything else (e.g. a hand-edited battle state) is skipped and counts as neutral
     t_mult = 1.0
-    mtype = move_meta.get("type")
-    if mtype:
-        for d in defn.get("types", []):
-            t_mult *= TYPE_EFFECTIVENESS.get(mtype, {}).get(d, 1.0)
+    if mtype in TYPE_EFFECTIVENESS:
+        row = TYPE_EFFECTIVENESS[mtype]
+        for d in defn.get("types", ()):
+            if d in row:
+                t_mult *= row[d]
 
-    # Simplified damage formula
-    base = (((2 * 50 / 5 + 2) * power * (atk / max(1, defense))) / 50) + 2
-    dmg = int(base * stab * t_mult * crit * rand)
+    dmg = _damage(power, atk, defense, stab, t_mult, crit, rand)
     meta = {"stab": stab, "type_mult": t_mult, "crit": crit}
     return max(0, dmg), meta
 
 # -------------------------------
-# MCP Tools (get_pokemon, get_move, start_battle, play_turn)
+# MCP Tools (get_pokemon, get_move, cache_info, start_battle, play_turn)
 # -------------------------------
 @mcp.tool()
-def get_pokemon(name: str) -> Dict:
+async def get_pokemon(name: str) -> Dict:
     """Fetch and return Pokémon data (names, stats, types, move list)."""
-    return fetch_pokemon(name)
+    return await fetch_pokemon(name)
 
 @mcp.tool()
-def get_move(name: str) -> Dict:
+async def get_move(name: str) -> Dict:
     """Fetch and return move metadata (cached)."""
-    return fetch_move(name)
+    return await fetch_move(name)
+
+@mcp.tool()
+def cache_info() -> Dict:
+    """Report hit/miss counts and sizes of the Pokémon and move caches."""
+    return {"pokemon": POKEMON_CACHE.cache_info(), "moves": MOVE_CACHE.cache_info()}
 
 @mcp.tool()
-def start_battle(user_pokemon: str) -> Dict:
+async def start_battle(user_pokemon: str) -> Dict:
     """Initialize a 1v1 battle.
     User chooses their Pokémon; opponent chosen randomly from the entire Pokédex.
     """
-    global ALL_POKEMON_CACHE
-    p1 = fetch_pokemon(user_pokemon)
-
-    # Fetch full Pokémon list once and cache it in memory
-    if ALL_POKEMON_CACHE is None:
-        url = f"{POKEAPI_BASE}/pokemon?limit=10000"
-        res = requests.get(url)
-        if res.status_code != 200:
-            # fallback small pool if API fails
-            all_pokemon = ["charmander", "squirtle", "bulbasaur", "pidgey", "geodude"]
-        else:
-            all_pokemon = [entry["name"] for entry in res.json().get("results", [])]
-        ALL_POKEMON_CACHE = all_pokemon
-    else:
-        all_pokemon = ALL_POKEMON_CACHE
+    p1 = await fetch_pokemon(user_pokemon)
+
+    # Full Pokémon list is preloaded in the background at import; wait briefly if it's still in flight
+    if not _ALL_READY.is_set():
+        await asyncio.to_thread(_ALL_READY.wait, 10)
+    # fallback small pool if the API failed
+    all_pokemon = ALL_POKEMON_CACHE or FALLBACK_POKEMON
 
     # Pick random opponent from cached list; ensure it's not the same as user
-    opponent_choice = random.choice(all_pokemon)
+    opponent_choice = rng().choice(all_pokemon)
     # avoid exact same species as user's choice when possible
     if normalize_name(opponent_choice) == normalize_name(user_pokemon) and len(all_pokemon) > 1:
         # try a few times
         for _ in range(3):
-            candidate = random.choice(all_pokemon)
+            candidate = rng().choice(all_pokemon)
             if normalize_name(candidate) != normalize_name(user_pokemon):
                 opponent_choice = candidate
                 break
 
-    p2 = fetch_pokemon(opponent_choice)
+    p2 = await fetch_pokemon(opponent_choice)
+    # the opponent AI scans p2's learnset on its first turn; start warming MOVE_CACHE now
+    prefetch_learnset(p2)
 
     state = {
         "pokemon1": p1,
@@ -323,7 +691,7 @@ def start_battle(user_pokemon: str) -> Dict:
     return state
 
 @mcp.tool()
-def play_turn(state: Dict, move_user: str) -> Dict:
+async def play_turn(state: Dict, move_user: str) -> Dict:
     """
     Play one turn with proper status/damage mechanics and cached lookups.
     """
@@ -331,50 +699,60 @@ def play_turn(state: Dict, move_user: str) -> Dict:
     p2 = state["pokemon2"]
     hp1 = state["hp1"]
     hp2 = state["hp2"]
+    log = []  # this turn's messages; appended to state["log"] once on exit
+
+    # Opponent (LLM) chooses a move: its strongest damaging move by power x accuracy.
+    # Worked out once per battle and carried in the state, so later turns skip the scan.
+    if p2.get("best_move_meta") is None:
+        # scan the full learnset only once; afterwards damaging_moves narrows it down
+        candidates = p2["moves"] if p2.get("damaging_moves") is None else p2["damaging_moves"]
+        await await_learnset(p2)
+        damaging = await find_damaging_moves(candidates)
+        # an empty scan (e.g. every lookup failed) is not remembered, so the next turn scans again
+        if damaging:
+            p2["damaging_moves"] = [name for name, _ in damaging]
+            usable = [mm for name, mm in damaging if name not in DRAWBACK_MOVES] or [mm for _, mm in damaging]
+            p2["best_move_meta"] = max(usable, key=expected_power)
+    if p2.get("best_move_meta"):
+        opponent_meta = p2["best_move_meta"]
+    else:
+        opponent_meta = await fetch_move(p2["moves"][0] if p2["moves"] else "tackle")
 
-    # Opponent (LLM) chooses a move: prefer damaging moves; fetch_move is cached
-    opp_moves = p2["moves"][:]
-    random.shuffle(opp_moves)
-    move_opponent = None
-    for m in opp_moves:
-        mm = fetch_move(m)
-        if mm["damage_class"] in ("physical", "special") and mm.get("power"):
-            move_opponent = mm["name"]
-            break
-    if not move_opponent:
-        move_opponent = opp_moves[0] if opp_moves else "tackle"
-
-    # normalize move names
-    move_user_norm = normalize_name(move_user)
-    move_opponent_norm = normalize_name(move_opponent)
+    # fetch move metadata (cached)
+    user_meta = await fetch_move(move_user)
 
     # Determine speed with paralysis
-    spd1 = p1["stats"]["speed"] // 2 if p1.get("status") and p1["status"]["name"] == "paralysis" else p1["stats"]["speed"]
-    spd2 = p2["stats"]["speed"] // 2 if p2.get("status") and p2["status"]["name"] == "paralysis" else p2["stats"]["speed"]
-
-    order = [(p1, move_user_norm, "hp2"), (p2, move_opponent_norm, "hp1")]
-    if spd2 > spd1:
-        order.reverse()
-
-    for attacker, move_name_norm, target_hp in order:
+    spd1 = p1.get("speed") or p1["stats"].get("speed", 1)
+    spd2 = p2.get("speed") or p2["stats"].get("speed", 1)
+    st1, st2 = p1.get("status"), p2.get("status")
+    if st1 and AILMENT_STATUS.get(st1["name"]) is PARALYSIS:
+        spd1 //= 2
+    if st2 and AILMENT_STATUS.get(st2["name"]) is PARALYSIS:
+        spd2 //= 2
+
+    # faster Pokémon moves first; the user's Pokémon wins speed ties
+    pairs = ((p1, user_meta, "hp2"), (p2, opponent_meta, "hp1"))
+    order = pairs if spd1 >= spd2 else pairs[::-1]
+
+    for attacker, move_meta, target_hp in order:
         defender = p2 if target_hp == "hp2" else p1
 
         # check if attacker can act
         ok, msg = can_act(attacker)
         if not ok:
-            state["log"].append(msg)
+            log.append(msg)
             continue
 
-        # fetch move metadata (cached)
-        move_meta = fetch_move(move_name_norm)
         dmg_or_msg, meta = calculate_damage(attacker, defender, move_meta)
 
         # meta as string -> status applied or special message
         if isinstance(meta, str):
-            state["log"].append(f"{attacker['name']} used {move_meta['name']}! {meta}")
+            log.append(f"{attacker['name']} used {move_meta['name']}! {meta}")
         else:
-            if dmg_or_msg == 0:
-                state["log"].append(f"{attacker['name']} used {move_meta['name']}, but it missed!")
+            if meta["type_mult"] == 0:
+                log.append(f"{attacker['name']} used {move_meta['name']}! It doesn't affect {defender['name']}...")
+            elif dmg_or_msg == 0:
+                log.append(f"{attacker['name']} used {move_meta['name']}, but it missed!")
             else:
                 if target_hp == "hp2":
                     hp2 -= dmg_or_msg
@@ -383,13 +761,13 @@ def play_turn(state: Dict, move_user: str) -> Dict:
 
                 eff = " Super effective!" if meta.get("type_mult", 1.0) > 1.0 else (" Not very effective..." if 0 < meta.get("type_mult", 1.0) < 1.0 else "")
                 crit_txt = " Critical hit!" if meta.get("crit", 1) > 1 else ""
-                state["log"].append(f"{attacker['name']} used {move_meta['name']}! {dmg_or_msg} damage.{eff}{crit_txt}")
+                log.append(f"{attacker['name']} used {move_meta['name']}! {dmg_or_msg} damage.{eff}{crit_txt}")
 
-        # apply secondary ailment if move_meta has an ailment chance (damaging moves)
-        if isinstance(meta, dict) and move_meta.get("ailment"):
+        # apply secondary ailment if move_meta has an ailment chance (damaging moves that connected)
+        if isinstance(meta, dict) and meta["type_mult"] and move_meta.get("ailment"):
             apply_msg = apply_ailment_from_move(move_meta, defender, by_status_move=False)
             if apply_msg:
-                state["log"].append(f"Secondary effect: {apply_msg}")
+                log.append(f"Secondary effect: {apply_msg}")
 
         # immediate faint check
         if hp1 <= 0 or hp2 <= 0:
@@ -397,30 +775,34 @@ def play_turn(state: Dict, move_user: str) -> Dict:
             hp2 = max(0, hp2)
             winner = p1["name"] if hp2 <= 0 else p2["name"]
             state.update({"hp1": hp1, "hp2": hp2})
-            state["log"].append(f"{winner} wins the battle!")
+            log.append(f"{winner} wins the battle!")
+            state["log"].extend(log)
             return state
 
     # End-of-turn passive damage and duration handling
     hp1, logs1 = apply_status_end_of_turn(p1, hp1)
     hp2, logs2 = apply_status_end_of_turn(p2, hp2)
-    state["log"].extend(logs1 + logs2)
+    log.extend(logs1)
+    log.extend(logs2)
 
     if hp1 <= 0 or hp2 <= 0:
         hp1 = max(0, hp1)
         hp2 = max(0, hp2)
         winner = p1["name"] if hp2 <= 0 else p2["name"]
         state.update({"hp1": hp1, "hp2": hp2})
-        state["log"].append(f"{winner} wins the battle!")
+        log.append(f"{winner} wins the battle!")
+        state["log"].extend(log)
         return state
 
     # update and return
     state.update({"hp1": hp1, "hp2": hp2, "turn": state["turn"] + 1})
+    state["log"].extend(log)
     return state
 
 # Backwards-compatible alias
 @mcp.tool()
-def play_turn_chance(state: Dict, move_user: str) -> Dict:
-    return play_turn(state, move_user)
+async def play_turn_chance(state: Dict, move_user: str) -> Dict:
+    return await play_turn(state, move_user)
 
 # -------------------------------
 # Entrypoint